@@ -1,6 +1,23 @@
 # ai.py
+import threading
 import time
+from functools import lru_cache
 from constants import *
+from analysis_cache import BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+
+# Set from another thread to abort a running search as if its time had run out
+stop_event = threading.Event()
+# Nodes visited by the current search
+search_nodes = 0
+
+def out_of_time(start_time, time_limit):
+    return stop_event.is_set() or time.time() - start_time > time_limit
+
+@lru_cache(maxsize=None)
+def get_center_squares(board_size):
+    # The 3x3 block around the middle of the board
+    middle = board_size // 2
+    return frozenset((row, col) for row in range(middle - 1, middle + 2) for col in range(middle - 1, middle + 2))
 
 # Evaluation Function
 def evaluate_board(game):
@@ -21,23 +38,21 @@ def evaluate_board(game):
     piece_value = 1000  # High value to emphasize material
 
     # Center squares
-    center_squares = [
-        (4, 4), (4, 3), (4, 5), (3, 4), (5, 4),
-        (3, 3), (3, 5), (5, 3), (5, 5)
-    ]
+    center_squares = get_center_squares(game.board_size)
+    board_size = game.board_size
 
     player_pieces = 0
     opponent_pieces = 0
 
-    for row in range(BOARD_SIZE):
-        for col in range(BOARD_SIZE):
+    for row in range(board_size):
+        for col in range(board_size):
             piece = game.board[row][col]
             if piece == player:
                 player_pieces += 1
                 score += piece_value  # Assign value to player's piece
 
                 # Advancement towards the last row
-                advancement = row if player == 'B' else (BOARD_SIZE - 1 - row)
+                advancement = row if player == 'B' else (board_size - 1 - row)
                 score += advancement * 5  # Reduced advancement weight
 
                 # Control of the center
@@ -53,7 +68,7 @@ def evaluate_board(game):
                 score -= piece_value  # Subtract value for opponent's piece
 
                 # Advancement towards the last row
-                advancement = row if opponent == 'B' else (BOARD_SIZE - 1 - row)
+                advancement = row if opponent == 'B' else (board_size - 1 - row)
                 score -= advancement * 5  # Reduced opponent's advancement
 
                 # Control of the center
@@ -100,9 +115,13 @@ def order_moves(game, moves, killer_moves=None, depth=0):
     return [move for _, move in ordered_moves]
 
 def pvs(game, depth, alpha, beta, start_time, time_limit):
-    if time.time() - start_time > time_limit:
+    if out_of_time(start_time, time_limit):
         raise TimeoutError
 
+    # A repeated position inside the search is scored as a draw
+    if game.is_repetition():
+        return 0
+
     zobrist_hash = game.zobrist_hash
     if zobrist_hash in transposition_table:
         entry = transposition_table[zobrist_hash]
@@ -114,6 +133,8 @@ def pvs(game, depth, alpha, beta, start_time, time_limit):
         return float('inf')
     elif winner == ('W' if game.current_player == 'B' else 'B'):
         return float('-inf')
+    elif winner == 'D':
+        return 0
 
     if depth == 0:
         return game.evaluate()
@@ -130,7 +151,6 @@ def pvs(game, depth, alpha, beta, start_time, time_limit):
     for i, move in enumerate(moves):
         start, end = move
         move_info, captured_piece_info = game.make_move(start, end)
-        game.switch_player()
 
         if i == 0:
             # Full window search for the first move
@@ -142,7 +162,6 @@ def pvs(game, depth, alpha, beta, start_time, time_limit):
                 # Re-search with full window if null-window search failed
                 eval = -pvs(game, depth - 1, -beta, -alpha, start_time, time_limit)
 
-        game.switch_player()
         game.undo_move(move_info, captured_piece_info)
 
         if eval > max_eval:
@@ -156,39 +175,65 @@ def pvs(game, depth, alpha, beta, start_time, time_limit):
     return max_eval
 
 # Negamax with Alpha-Beta Pruning and Iterative Deepening
-def negamax(game, depth, alpha, beta, start_time, time_limit, killer_moves):
-    if time.time() - start_time > time_limit:
+def negamax(game, depth, alpha, beta, start_time, time_limit, killer_moves, tt=None):
+    global search_nodes
+    search_nodes += 1
+    if out_of_time(start_time, time_limit):
         raise TimeoutError
 
+    # A repeated position inside the search is scored as a draw
+    if game.is_repetition():
+        return 0
+
     # Check for terminal conditions
     winner = game.check_win()
     if winner == game.current_player:
         return float('inf')
     elif winner == ('W' if game.current_player == 'B' else 'B'):
         return float('-inf')
+    elif winner == 'D':
+        return 0
+
+    # Optional transposition table with bounds and best moves
+    tt_move = None
+    if tt is not None:
+        entry = tt.get(game.zobrist_hash)
+        if entry:
+            if entry['depth'] >= depth:
+                value = entry['value']
+                if entry['bound'] == BOUND_EXACT:
+                    return value
+                if entry['bound'] == BOUND_LOWER and value >= beta:
+                    return value
+                if entry['bound'] == BOUND_UPPER and value <= alpha:
+                    return value
+            tt_move = entry['move']
 
     if depth == 0:
         return game.evaluate()
 
+    alpha_orig = alpha
     max_eval = float('-inf')
+    best_move = None
     moves = game.get_all_moves()
     moves = order_moves(game, moves, killer_moves, depth)  # Pass killer_moves and depth
+    if tt_move in moves:
+        moves.remove(tt_move)
+        moves.insert(0, tt_move)
 
     for move in moves:
         start, end = move
         move_info, captured_piece_info = game.make_move(start, end)
-        game.switch_player()
         try:
-            eval = -negamax(game, depth - 1, -beta, -alpha, start_time, time_limit, killer_moves)
+            eval = -negamax(game, depth - 1, -beta, -alpha, start_time, time_limit, killer_moves, tt)
         except TimeoutError:
-            game.switch_player()
             game.undo_move(move_info, captured_piece_info)
             raise TimeoutError
-        game.switch_player()
         game.undo_move(move_info, captured_piece_info)
 
-        if eval > max_eval:
+        if eval > max_eval or best_move is None:
             max_eval = eval
+            best_move = move
 
         alpha = max(alpha, eval)
         if alpha >= beta:
@@ -202,13 +247,23 @@ def negamax(game, depth, alpha, beta, start_time, time_limit, killer_moves):
                     killer_moves[depth] = killer_moves[depth][-2:]
             break  # Alpha-beta pruning
 
+    if tt is not None:
+        if max_eval <= alpha_orig:
+            bound = BOUND_UPPER
+        elif max_eval >= beta:
+            bound = BOUND_LOWER
+        else:
+            bound = BOUND_EXACT
+        tt[game.zobrist_hash] = {'value': max_eval, 'depth': depth, 'bound': bound, 'move': best_move}
+
     return max_eval
 
 # AI move selection with Iterative Deepening
-def get_ai_move(game, max_depth, time_limit):
+def get_ai_move(game, max_depth, time_limit, analysis_cache=None):
     best_move = None
     start_time = time.time()
-    global transposition_table
+    global transposition_table, search_nodes
+    search_nodes = 0
     transposition_table = {}
     killer_moves = {}  # Initialize killer moves
 
@@ -232,34 +287,51 @@ def get_ai_move(game, max_depth, time_limit):
         moves_to_consider = all_moves
         search_depth = max_depth  # Use the provided max_depth
 
+    # Resume from a deeper result stored by an earlier session, if any. Repetition
+    # draws make scores depend on the moves that led here, so the cache is only
+    # used right after an irreversible move, where no earlier position can recur.
+    first_depth = 1
+    if analysis_cache is not None and game.reversible_plies > 0:
+        analysis_cache = None
+    if analysis_cache is not None:
+        if analysis_cache.board_size != game.board_size:
+            raise ValueError(f"Analysis cache is for {analysis_cache.board_size}x{analysis_cache.board_size} boards, "
+                             f"not {game.board_size}x{game.board_size}")
+        entry = analysis_cache.probe(game.zobrist_hash)
+        if entry and entry['move'] in moves_to_consider:
+            best_move = entry['move']
+            if entry['depth'] >= search_depth:
+                return best_move
+            first_depth = entry['depth'] + 1
+
     # Iterative Deepening
-    for depth in range(1, search_depth + 1):
+    for depth in range(first_depth, search_depth + 1):
         print('Enter depth:', depth)
-        if time.time() - start_time > time_limit:
+        if out_of_time(start_time, time_limit):
             break
 
         max_eval = float('-inf')
         alpha = float('-inf')
         beta = float('inf')
         current_best_move = None
+        completed = True
 
         moves = game.get_all_moves()
         moves = order_moves(game, moves, killer_moves, depth)
 
         for move in moves:
-            if time.time() - start_time > time_limit:
+            if out_of_time(start_time, time_limit):
+                completed = False
                 break
 
             start, end = move
             move_info, captured_piece_info = game.make_move(start, end)
-            game.switch_player()
             try:
                 eval = -negamax(game, depth - 1, -beta, -alpha, start_time, time_limit, killer_moves)
             except TimeoutError:
-                game.switch_player()
                 game.undo_move(move_info, captured_piece_info)
+                completed = False
                 break
-            game.switch_player()
             game.undo_move(move_info, captured_piece_info)
 
             if eval > max_eval:
@@ -272,8 +344,86 @@ def get_ai_move(game, max_depth, time_limit):
 
         if current_best_move:
             best_move = current_best_move
+            # Only fully searched depths are worth keeping across sessions
+            if completed and analysis_cache is not None:
+                analysis_cache.store(game.zobrist_hash, depth, max_eval, BOUND_EXACT, best_move)
+
+        if out_of_time(start_time, time_limit):
+            break
 
-        if time.time() - start_time > time_limit:
+    return best_move
+
+def extract_pv(game, tt, max_length):
+    # Follow best moves stored in the transposition table from the current position
+    pv = []
+    made = []
+    seen = set()
+    while len(pv) < max_length and game.zobrist_hash not in seen:
+        seen.add(game.zobrist_hash)
+        entry = tt.get(game.zobrist_hash)
+        if not entry or entry['move'] not in game.get_all_moves():
             break
+        pv.append(entry['move'])
+        made.append(game.make_move(*entry['move']))
+    for move_info, captured_piece_info in reversed(made):
+        game.undo_move(move_info, captured_piece_info)
+    return pv
+
+# Multi-PV analysis: the best num_pv root moves with scores and principal variations
+def get_ai_analysis(game, max_depth, time_limit, num_pv=3, tt=None, info_callback=None):
+    global search_nodes
+    search_nodes = 0
+    start_time = time.time()
+    killer_moves = {}
+    if tt is None:
+        tt = {}  # Shared by all PV lines and depths so later lines search mostly cached trees
+
+    root_moves = game.get_all_moves()
+    lines = []
+
+    # Iterative Deepening; each depth searches num_pv lines, excluding the moves
+    # already picked for earlier lines from the root
+    for depth in range(1, max_depth + 1):
+        if out_of_time(start_time, time_limit):
+            break
+
+        depth_lines = []
+        excluded = []
+        previous_order = [line['move'] for line in lines]
+        try:
+            for _ in range(min(num_pv, len(root_moves))):
+                remaining = [move for move in root_moves if move not in excluded]
+                remaining = order_moves(game, remaining, killer_moves, depth)
+                # Search last depth's ranking first
+                remaining.sort(key=lambda move: previous_order.index(move) if move in previous_order else len(previous_order))
+
+                max_eval = float('-inf')
+                alpha = float('-inf')
+                best_move = None
+                for move in remaining:
+                    start, end = move
+                    move_info, captured_piece_info = game.make_move(start, end)
+                    try:
+                        eval = -negamax(game, depth - 1, float('-inf'), -alpha, start_time, time_limit, killer_moves, tt)
+                    finally:
+                        game.undo_move(move_info, captured_piece_info)
+
+                    if eval > max_eval or best_move is None:
+                        max_eval = eval
+                        best_move = move
+                    alpha = max(alpha, eval)
+
+                move_info, captured_piece_info = game.make_move(*best_move)
+                pv = [best_move] + extract_pv(game, tt, depth - 1)
+                game.undo_move(move_info, captured_piece_info)
+
+                depth_lines.append({'move': best_move, 'score': max_eval, 'depth': depth, 'pv': pv})
+                excluded.append(best_move)
+        except TimeoutError:
+            break
+
+        lines = depth_lines
+        if info_callback:
+            info_callback(lines)
 
-    return best_move
\ No newline at end of file
+    return lines
@@ -0,0 +1,153 @@
+# analysis_cache.py
+import os
+import struct
+import sys
+from constants import BOARD_SIZE, ZOBRIST_VERSION
+
+# Bound types for stored scores
+BOUND_EXACT = 0
+BOUND_LOWER = 1
+BOUND_UPPER = 2
+
+# File layout: a header followed by fixed-size records that are only ever appended
+CACHE_MAGIC = b'FNCA'
+CACHE_FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHHH')  # magic, format version, Zobrist version, board size
+RECORD = struct.Struct('<QdBBHH')  # hash, score, depth, bound, from square, to square
+NO_SQUARE = 0xFFFF  # Above every square index of a supported board
+MAX_BOARD_SIZE = 255
+
+
+def encode_move(move, board_size=BOARD_SIZE):
+    if move is None:
+        return NO_SQUARE, NO_SQUARE
+    (s_row, s_col), (e_row, e_col) = move
+    return s_row * board_size + s_col, e_row * board_size + e_col
+
+
+def decode_move(from_square, to_square, board_size=BOARD_SIZE):
+    if from_square == NO_SQUARE:
+        return None
+    return divmod(from_square, board_size), divmod(to_square, board_size)
+
+
+def file_board_size(path):
+    # Board size recorded in a cache file's header, or None if it has no valid header
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        return None
+    magic, version, zobrist_version, board_size = HEADER.unpack(data)
+    if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION or zobrist_version != ZOBRIST_VERSION:
+        return None
+    return board_size
+
+
+class AnalysisCache:
+    """Persistent store of deep search results keyed by Zobrist hash.
+
+    Entries map a hash to (depth, score, bound, best move). The file is read
+    lazily on the first probe, new results are appended, and the deepest
+    entry per hash wins. Run compact() offline to drop superseded records.
+    A cache file holds positions of a single board size; a file with another
+    header raises ValueError rather than being read or overwritten.
+    """
+
+    def __init__(self, path, board_size=BOARD_SIZE):
+        if not 0 < board_size <= MAX_BOARD_SIZE:
+            raise ValueError(f"Analysis caches support boards up to {MAX_BOARD_SIZE}x{MAX_BOARD_SIZE}")
+        self.path = path
+        self.board_size = board_size
+        self.entries = None  # Loaded on first use
+
+    def header(self):
+        return HEADER.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, ZOBRIST_VERSION, self.board_size)
+
+    def is_fresh(self, data):
+        # True for an empty file or one cut off while its header was being written
+        return len(data) < HEADER.size and self.header().startswith(data)
+
+    def check_header(self, data):
+        # Files written with other keys, another format or another board size are
+        # neither read nor overwritten, so pointing at the wrong file loses nothing
+        if data[:HEADER.size] != self.header():
+            raise ValueError(f"{self.path} is not a {self.board_size}x{self.board_size} analysis cache "
+                             f"of format version {CACHE_FORMAT_VERSION} and Zobrist version {ZOBRIST_VERSION}")
+
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if self.is_fresh(data):
+            return
+        self.check_header(data)
+        end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+        for zobrist_hash, score, depth, bound, from_square, to_square in RECORD.iter_unpack(data[HEADER.size:end]):
+            self.store_entry(zobrist_hash, depth, score, bound, decode_move(from_square, to_square, self.board_size))
+
+    def ensure_loaded(self):
+        if self.entries is None:
+            self.load()
+
+    def store_entry(self, zobrist_hash, depth, score, bound, best_move):
+        entry = self.entries.get(zobrist_hash)
+        if entry is None or depth >= entry['depth']:
+            self.entries[zobrist_hash] = {'depth': depth, 'score': score, 'bound': bound, 'move': best_move}
+            return True
+        return False
+
+    def probe(self, zobrist_hash):
+        self.ensure_loaded()
+        return self.entries.get(zobrist_hash)
+
+    def store(self, zobrist_hash, depth, score, bound, best_move):
+        self.ensure_loaded()
+        if not self.store_entry(zobrist_hash, depth, score, bound, best_move):
+            return
+        self.prepare_file()
+        with open(self.path, 'ab') as f:
+            f.write(RECORD.pack(zobrist_hash, score, depth, bound, *encode_move(best_move, self.board_size)))
+
+    def prepare_file(self):
+        # Start a fresh file if it is missing or empty, and cut off a partial
+        # record left by an interrupted write so appends stay aligned
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        data = b''
+        if size:
+            with open(self.path, 'rb') as f:
+                data = f.read(HEADER.size)
+        if self.is_fresh(data):
+            with open(self.path, 'wb') as f:
+                f.write(self.header())
+            return
+        self.check_header(data)
+        excess = (size - HEADER.size) % RECORD.size
+        if excess:
+            with open(self.path, 'r+b') as f:
+                f.truncate(size - excess)
+
+    def compact(self):
+        # Rewrite the file keeping only the deepest record per hash
+        self.load()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.header())
+            for zobrist_hash, entry in self.entries.items():
+                f.write(RECORD.pack(zobrist_hash, entry['score'], entry['depth'], entry['bound'],
+                                    *encode_move(entry['move'], self.board_size)))
+        os.replace(tmp_path, self.path)
+        return len(self.entries)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != 'compact':
+        print("usage: python analysis_cache.py compact PATH")
+        sys.exit(1)
+    board_size = file_board_size(sys.argv[2])
+    if board_size is None:
+        print(f"{sys.argv[2]} is not a version {CACHE_FORMAT_VERSION} analysis cache")
+        sys.exit(1)
+    count = AnalysisCache(sys.argv[2], board_size).compact()
+    print(f"Compacted {sys.argv[2]}: {count} positions")
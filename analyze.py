@@ -0,0 +1,122 @@
+# analyze.py
+import argparse
+import json
+import os
+import sys
+import time
+import signal
+from multiprocessing import Pool
+
+# Workers never draw, so keep pygame (initialized by constants) off the display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import ai
+from ai import get_ai_analysis
+from game import FiancoGame
+
+
+def read_positions(path):
+    # One position string per line; blank lines and '#' comments are skipped
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                yield line
+
+
+def json_score(score):
+    if score == float('inf'):
+        return 'win'
+    if score == float('-inf'):
+        return 'loss'
+    return int(score)
+
+
+def init_worker():
+    # SDL (started by pygame in constants) turns SIGTERM into a quit event,
+    # which would keep Pool.terminate() waiting on the workers forever
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def analyze_position(job):
+    # Runs in a worker process; every position gets a fresh game and table so
+    # results don't depend on which worker handled which positions
+    index, position, depth, time_limit = job
+    result = {'index': index, 'position': position}
+    try:
+        game = FiancoGame.from_position_string(position)
+    except ValueError as e:
+        result['error'] = str(e)
+        return result
+
+    start_time = time.time()
+    lines = get_ai_analysis(game, depth, time_limit, num_pv=1)
+    result['time'] = round(time.time() - start_time, 3)
+    result['nodes'] = ai.search_nodes
+    if lines:
+        line = lines[0]
+        notation = game.format_moves(line['pv'])
+        result.update(bestmove=notation[0], score=json_score(line['score']), depth=line['depth'], pv=notation)
+    else:
+        # No legal moves, or the time ran out before depth 1 finished
+        result.update(bestmove=None, score=None, depth=0, pv=[])
+    return result
+
+
+def completed_results(path, positions):
+    # Number of results already in the output file. A partial last line left by an
+    # interrupted run is cut off so appends start on a clean line.
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    valid_length = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                result = json.loads(line)
+            except ValueError:
+                break
+            if count >= len(positions) or result.get('position') != positions[count]:
+                raise ValueError(f"{path} does not match the input positions at result {count}")
+            count += 1
+            valid_length += len(line)
+    with open(path, 'r+b') as f:
+        f.truncate(valid_length)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a file of Fianco positions in parallel")
+    parser.add_argument('positions', help="file with one position string per line")
+    parser.add_argument('-o', '--output', help="JSON lines output file; an existing file is resumed")
+    parser.add_argument('--depth', type=int, default=4, help="search depth (default: 4)")
+    parser.add_argument('--movetime', type=int, help="time limit per position in milliseconds")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    positions = list(read_positions(args.positions))
+    time_limit = args.movetime / 1000 if args.movetime else float('inf')
+
+    if args.output:
+        done = completed_results(args.output, positions)
+        output = open(args.output, 'a')
+    else:
+        done = 0
+        output = sys.stdout
+
+    jobs = [(index, positions[index], args.depth, time_limit) for index in range(done, len(positions))]
+    try:
+        with Pool(args.workers, initializer=init_worker) as pool:
+            # imap keeps input order, so results stream out as soon as the next one is ready
+            for result in pool.imap(analyze_position, jobs):
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
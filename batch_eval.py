@@ -0,0 +1,123 @@
+# batch_eval.py
+from functools import lru_cache
+
+import numpy as np
+from constants import BOARD_SIZE
+
+# Square and side encoding for packed positions
+EMPTY = 0
+BLACK = 1
+WHITE = -1
+SIDE_CODES = {'B': BLACK, 'W': WHITE}
+
+# Same weights as evaluate_board; pass a modified copy to tune them
+DEFAULT_WEIGHTS = {
+    'piece': 1000,
+    'advancement': 5,
+    'center': 10,
+    'super_strong': 500,
+    'mobility': 2,
+}
+
+
+@lru_cache(maxsize=None)
+def board_masks(board_size):
+    # Center block and per-row advancement for each player on a board of this size
+    middle = board_size // 2
+    center = np.zeros((board_size, board_size), dtype=bool)
+    center[middle - 1:middle + 2, middle - 1:middle + 2] = True
+    black_advancement = np.arange(board_size).reshape(board_size, 1)
+    white_advancement = board_size - 1 - black_advancement
+    return center, black_advancement, white_advancement
+
+
+def pack_positions(games):
+    # Pack same-sized FiancoGame boards into an N x size x size int8 array plus
+    # an N array of sides to move
+    board_size = games[0].board_size if games else BOARD_SIZE
+    boards = np.zeros((len(games), board_size, board_size), dtype=np.int8)
+    players = np.empty(len(games), dtype=np.int8)
+    for i, game in enumerate(games):
+        for row in range(board_size):
+            for col in range(board_size):
+                piece = game.board[row][col]
+                if piece in SIDE_CODES:
+                    boards[i, row, col] = SIDE_CODES[piece]
+        players[i] = SIDE_CODES[game.current_player]
+    return boards, players
+
+
+def super_strong(own, opponent, forward):
+    # A piece is super strong when no opponent piece sits in the cone ahead of it.
+    # The cone of a square is the union of the cones (apex included) of the three
+    # squares in front of it, so it can be built one row at a time from the far side.
+    n, board_size, _ = own.shape
+    blocked = np.zeros((n, board_size, board_size), dtype=bool)  # Cone ahead holds an opponent
+    rows = range(board_size - 2, -1, -1) if forward == 1 else range(1, board_size)
+    for row in rows:
+        ahead = opponent[:, row + forward] | blocked[:, row + forward]
+        spread = ahead.copy()
+        spread[:, 1:] |= ahead[:, :-1]
+        spread[:, :-1] |= ahead[:, 1:]
+        blocked[:, row] = spread
+    return own & ~blocked
+
+
+def count_moves(own, opponent, empty, forward):
+    # Legal move count per position; captures are mandatory when any exist
+    if forward == 1:
+        steps = (own[:, :-1] & empty[:, 1:]).sum(axis=(1, 2))
+        captures = ((own[:, :-2, 2:] & opponent[:, 1:-1, 1:-1] & empty[:, 2:, :-2]).sum(axis=(1, 2))
+                    + (own[:, :-2, :-2] & opponent[:, 1:-1, 1:-1] & empty[:, 2:, 2:]).sum(axis=(1, 2)))
+    else:
+        steps = (own[:, 1:] & empty[:, :-1]).sum(axis=(1, 2))
+        captures = ((own[:, 2:, 2:] & opponent[:, 1:-1, 1:-1] & empty[:, :-2, :-2]).sum(axis=(1, 2))
+                    + (own[:, 2:, :-2] & opponent[:, 1:-1, 1:-1] & empty[:, :-2, 2:]).sum(axis=(1, 2)))
+    sideways = ((own[:, :, 1:] & empty[:, :, :-1]).sum(axis=(1, 2))
+                + (own[:, :, :-1] & empty[:, :, 1:]).sum(axis=(1, 2)))
+    return np.where(captures > 0, captures, steps + sideways)
+
+
+def evaluate_batch(boards, players, weights=DEFAULT_WEIGHTS):
+    """Score N packed positions at once from the side to move's point of view.
+
+    boards is an N x size x size int8 array using EMPTY/BLACK/WHITE and players an
+    N array of BLACK/WHITE. Returns a float64 array equal to evaluate_board for
+    each position, including +/-inf for won and lost positions. Repetition
+    draws need the game history, so they are not detected here.
+    """
+    boards = np.asarray(boards)
+    players = np.asarray(players)
+    center, black_advancement, white_advancement = board_masks(boards.shape[1])
+    black = boards == BLACK
+    white = boards == WHITE
+    empty = boards == EMPTY
+
+    def side_terms(own, opponent, advancement, forward):
+        return (weights['piece'] * own.sum(axis=(1, 2))
+                + weights['advancement'] * (own * advancement).sum(axis=(1, 2))
+                + weights['center'] * (own & center).sum(axis=(1, 2))
+                + weights['super_strong'] * super_strong(own, opponent, forward).sum(axis=(1, 2)))
+
+    black_mobility = count_moves(black, white, empty, 1)
+    white_mobility = count_moves(white, black, empty, -1)
+
+    # Material, advancement, center control, passed pieces and mobility from Black's side
+    black_score = (side_terms(black, white, black_advancement, 1)
+                   - side_terms(white, black, white_advancement, -1)
+                   + weights['mobility'] * (black_mobility - white_mobility))
+    scores = np.where(players == BLACK, black_score, -black_score).astype(np.float64)
+
+    # Terminal positions, checked in the same order as FiancoGame.check_win
+    no_column = boards.shape[2]
+    white_goal = np.where(white[:, 0].any(axis=1), white[:, 0].argmax(axis=1), no_column)
+    black_goal = np.where(black[:, -1].any(axis=1), black[:, -1].argmax(axis=1), no_column)
+    white_won = (white_goal < no_column) & (white_goal <= black_goal)
+    black_won = (black_goal < no_column) & (black_goal < white_goal)
+    player_mobility = np.where(players == BLACK, black_mobility, white_mobility)
+    stuck = ~white_won & ~black_won & (player_mobility == 0)
+    won = ((players == WHITE) & white_won) | ((players == BLACK) & black_won)
+    lost = ((players == BLACK) & white_won) | ((players == WHITE) & black_won) | stuck
+    scores[won] = np.inf
+    scores[lost] = -np.inf
+    return scores
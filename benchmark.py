@@ -0,0 +1,61 @@
+# benchmark.py
+import argparse
+import os
+import time
+
+# Benchmarks never draw, so keep pygame (initialized by constants) off the display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import ai
+from ai import get_ai_analysis
+from game import FiancoGame
+
+
+def perft(game, depth):
+    # Number of move sequences of the given length; finished games are leaves
+    if depth == 0 or game.check_win():
+        return 1
+    nodes = 0
+    for move in game.get_all_moves():
+        move_info, captured_piece_info = game.make_move(*move)
+        nodes += perft(game, depth - 1)
+        game.undo_move(move_info, captured_piece_info)
+    return nodes
+
+
+def run_benchmark(board_size, perft_depth, search_depth):
+    game = FiancoGame(current_player='W', board_size=board_size)
+    area = board_size * board_size
+
+    start_time = time.time()
+    leaves = perft(game, perft_depth)
+    perft_time = time.time() - start_time
+    print(f"{board_size:>2}x{board_size:<2} perft({perft_depth}) {leaves:>10} leaves {perft_time:8.3f}s "
+          f"{leaves / perft_time:10.0f} leaves/s {perft_time / leaves / area * 1e9:8.1f} ns/leaf/square")
+
+    # Fresh game so the search doesn't start from the move caches filled by perft
+    game = FiancoGame(current_player='W', board_size=board_size)
+    tt = {}
+    start_time = time.time()
+    lines = get_ai_analysis(game, search_depth, float('inf'), num_pv=1, tt=tt)
+    search_time = time.time() - start_time
+    nodes = ai.search_nodes
+    best = game.format_move(lines[0]['move']) if lines else '-'
+    print(f"{board_size:>2}x{board_size:<2} search({search_depth}) {nodes:>9} nodes {search_time:8.3f}s "
+          f"{nodes / search_time:10.0f} nodes/s {search_time / nodes / area * 1e6:8.2f} us/node/square "
+          f"tt {len(tt)} best {best}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft and search benchmarks across board sizes")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9, 11, 13, 15], help="odd board sizes to run")
+    parser.add_argument('--perft-depth', type=int, default=3, help="perft depth (default: 3)")
+    parser.add_argument('--search-depth', type=int, default=3, help="search depth (default: 3)")
+    args = parser.parse_args()
+
+    for board_size in args.sizes:
+        run_benchmark(board_size, args.perft_depth, args.search_depth)
+
+
+if __name__ == "__main__":
+    main()
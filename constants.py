@@ -1,6 +1,8 @@
 # constants.py
+import os
 import pygame
-import random
+from array import array
+from functools import lru_cache
 
 # Initialize Pygame
 pygame.init()
@@ -20,14 +22,56 @@ WHITE = (255, 255, 255)
 BLUE = (0, 0, 255)
 GREEN = (0, 255, 0)
 
+# Number of occurrences of the same position that ends the game in a draw
+REPETITION_LIMIT = 3
+
 clock = pygame.time.Clock()
 killer_moves = {}
 
-PLAYER_HASH = random.getrandbits(64)
 # Create the screen
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Fianco Game with AI")
 
-# Initialize Zobrist hashing table
-ZOBRIST_TABLE = [[[random.getrandbits(64) for _ in range(2)] for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
-transposition_table = {}
\ No newline at end of file
+# Zobrist keys are generated from a fixed seed so hashes are identical across
+# runs and processes. Bump ZOBRIST_VERSION whenever the seed or layout changes,
+# since any stored hashes become invalid.
+ZOBRIST_VERSION = 1
+ZOBRIST_SEED = 0x9E3779B97F4A7C15
+ZOBRIST_BASE_SIZE = 9  # The board size whose keys come straight from ZOBRIST_SEED
+MASK_64 = (1 << 64) - 1
+PIECE_INDEX = {'B': 0, 'W': 1}
+
+def generate_zobrist_keys(count, seed=ZOBRIST_SEED):
+    # SplitMix64, so the key set doesn't depend on the random module's implementation
+    keys = array('Q')
+    state = seed
+    for _ in range(count):
+        state = (state + 0x9E3779B97F4A7C15) & MASK_64
+        z = state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+        keys.append(z ^ (z >> 31))
+    return keys
+
+def zobrist_seed(board_size):
+    # Each board size draws its keys from its own stream, so positions on
+    # different sizes never share a hash by lining up square indices. 9x9 keeps
+    # the original seed and therefore its existing hashes, whatever BOARD_SIZE is.
+    if board_size == ZOBRIST_BASE_SIZE:
+        return ZOBRIST_SEED
+    return generate_zobrist_keys(1, ZOBRIST_SEED ^ board_size)[0]
+
+@lru_cache(maxsize=None)
+def zobrist_keys(board_size):
+    # Flat key array indexed by (row * board_size + col) * 2 + piece_index,
+    # and the side-to-move key
+    keys = generate_zobrist_keys(board_size * board_size * 2 + 1, zobrist_seed(board_size))
+    return keys[:-1], keys[-1]
+
+transposition_table = {}
+
+# Optional path of the persistent analysis cache shared across sessions
+ANALYSIS_CACHE_PATH = os.environ.get('FIANCO_ANALYSIS_CACHE')
+
+# Optional path of the binary game record file that finished games are appended to
+GAME_RECORD_PATH = os.environ.get('FIANCO_GAME_RECORD')
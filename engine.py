@@ -0,0 +1,255 @@
+# engine.py
+import os
+import sys
+import threading
+import time
+
+# The engine never draws, so keep pygame (initialized by constants) off the display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import ai
+from ai import get_ai_analysis
+from game import FiancoGame
+
+ENGINE_NAME = 'Fianco AI'
+MAX_SEARCH_DEPTH = 64
+MAX_MULTI_PV = 32
+# The engine stays up indefinitely, so its tables are cleared once they pass these sizes
+MAX_TT_ENTRIES = 500_000
+MAX_MOVE_CACHE_ENTRIES = 50_000
+START_POSITION = FiancoGame(current_player='W').to_position_string()
+
+PROTOCOL_HELP = """Commands:
+  fianco                                    identify the engine, answered by 'fiancook'
+  isready                                   answered by 'readyok'
+  setoption name MultiPV value N            number of ranked lines to report
+  newgame                                   clear the transposition table
+  position startpos|pos <text> [moves ...]  set the position, then play the given moves
+  go [depth N] [movetime MS] [infinite] [ponder]
+  ponderhit                                 the pondered move was played; start the clock
+  stop                                      stop searching and report the best move
+  d                                         print the current position
+  quit"""
+
+
+def format_score(score):
+    if score == float('inf'):
+        return 'win'
+    if score == float('-inf'):
+        return 'loss'
+    return str(int(score))
+
+
+class FiancoEngine:
+    """Long-lived engine speaking a line protocol similar to UCI.
+
+    The transposition table and move caches are kept between commands, so
+    repeated queries on related positions start from a warm table. Each is
+    cleared before a search once it has grown past its size limit.
+    """
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.tt = {}
+        self.num_pv = 1
+        self.game = None
+        self.search_thread = None
+        self.ponder_time_limit = None
+        self.infinite = False
+        self.timer = None
+        # Cleared while pondering or searching infinitely: bestmove then waits for
+        # ponderhit or stop, even if the search finishes first
+        self.release = threading.Event()
+        self.set_game(FiancoGame(current_player='W'))
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def set_game(self, game):
+        # Share the move caches between positions of the same size; they are keyed
+        # by Zobrist hash. Keys differ per board size, so a new size starts afresh.
+        if self.game is not None and self.game.board_size == game.board_size:
+            game.move_cache = self.game.move_cache
+            game.capture_move_cache = self.game.capture_move_cache
+        else:
+            self.tt.clear()
+        self.game = game
+        # Kept aside because the search thread moves pieces around on self.game
+        self.position_string = game.to_position_string()
+
+    def run(self, input=sys.stdin):
+        for line in input:
+            if not self.handle(line):
+                break
+        self.stop()
+
+    def handle(self, line):
+        # Process one command line; returns False once the engine should exit
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'quit':
+            return False
+        if command == 'fianco':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"option name MultiPV type spin default 1 min 1 max {MAX_MULTI_PV}")
+            self.send("fiancook")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'newgame':
+            self.stop()
+            self.tt.clear()
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            self.go(args)
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'stop':
+            self.stop()
+        elif command == 'd':
+            self.send(self.position_string)
+        elif command == 'help':
+            self.send(PROTOCOL_HELP)
+        else:
+            self.send(f"info string unknown command: {command}")
+        return True
+
+    def set_option(self, args):
+        if len(args) == 4 and args[0] == 'name' and args[2] == 'value' and args[1].lower() == 'multipv':
+            try:
+                self.num_pv = max(1, min(MAX_MULTI_PV, int(args[3])))
+            except ValueError:
+                self.send(f"info string invalid MultiPV value: {args[3]}")
+        else:
+            self.send(f"info string unknown option: {' '.join(args)}")
+
+    def set_position(self, args):
+        moves = []
+        if 'moves' in args:
+            moves = args[args.index('moves') + 1:]
+            args = args[:args.index('moves')]
+        try:
+            if args[:1] == ['startpos']:
+                game = FiancoGame.from_position_string(START_POSITION)
+            elif args[:1] == ['pos'] and len(args) == 3:
+                game = FiancoGame.from_position_string(' '.join(args[1:]))
+            else:
+                raise ValueError("expected 'startpos' or 'pos <board> <side>'")
+            for text in moves:
+                move = game.parse_move(text)
+                if move not in game.get_all_moves():
+                    raise ValueError(f"illegal move {text}")
+                game.make_move(*move)
+        except (ValueError, IndexError) as e:
+            self.send(f"info string invalid position: {e}")
+            return
+        self.set_game(game)
+
+    def go(self, args):
+        depth = MAX_SEARCH_DEPTH
+        time_limit = float('inf')
+        ponder = False
+        infinite = False
+        i = 0
+        try:
+            while i < len(args):
+                if args[i] == 'depth':
+                    depth = int(args[i + 1])
+                    i += 1
+                elif args[i] == 'movetime':
+                    time_limit = int(args[i + 1]) / 1000
+                    i += 1
+                elif args[i] == 'ponder':
+                    ponder = True
+                elif args[i] == 'infinite':
+                    infinite = True
+                i += 1
+        except (ValueError, IndexError):
+            # Reported before stopping, so a bad command leaves a running search alone
+            self.send(f"info string invalid go command: {' '.join(args)}")
+            return
+        self.stop()
+
+        # While pondering the clock only starts at ponderhit
+        self.ponder_time_limit = time_limit if ponder else None
+        self.infinite = infinite
+        if ponder:
+            time_limit = float('inf')
+
+        self.trim_tables()
+        ai.stop_event.clear()
+        if ponder or infinite:
+            self.release.clear()
+        else:
+            self.release.set()
+        self.search_thread = threading.Thread(target=self.search, args=(depth, time_limit), daemon=True)
+        self.search_thread.start()
+
+    def trim_tables(self):
+        if len(self.tt) > MAX_TT_ENTRIES:
+            self.tt.clear()
+        for cache in (self.game.move_cache, self.game.capture_move_cache):
+            if len(cache) > MAX_MOVE_CACHE_ENTRIES:
+                cache.clear()
+
+    def ponderhit(self):
+        if self.ponder_time_limit is None:
+            return  # Not pondering
+        if self.ponder_time_limit != float('inf'):
+            self.timer = threading.Timer(self.ponder_time_limit, ai.stop_event.set)
+            self.timer.start()
+        self.ponder_time_limit = None
+        if not self.infinite:
+            self.release.set()
+
+    def search(self, depth, time_limit):
+        start_time = time.time()
+
+        def send_info(lines):
+            elapsed = int((time.time() - start_time) * 1000)
+            for i, line in enumerate(lines):
+                pv = ' '.join(self.game.format_moves(line['pv']))
+                self.send(f"info depth {line['depth']} multipv {i + 1} score {format_score(line['score'])} "
+                          f"nodes {ai.search_nodes} time {elapsed} pv {pv}")
+
+        try:
+            lines = get_ai_analysis(self.game, depth, time_limit, self.num_pv, self.tt, info_callback=send_info)
+        except Exception as e:
+            # Still answer so the front end isn't left waiting. The search may have
+            # left moves on the board, so start again from the position as set.
+            self.send(f"info string search failed: {e!r}")
+            self.set_game(FiancoGame.from_position_string(self.position_string))
+            lines = []
+        if lines:
+            best_move = lines[0]['move']
+        else:
+            # Stopped before the first depth finished; any legal move beats none
+            moves = self.game.get_all_moves()
+            best_move = moves[0] if moves else None
+        self.release.wait()
+        self.send(f"bestmove {self.game.format_move(best_move) if best_move else '(none)'}")
+
+    def stop(self):
+        ai.stop_event.set()
+        self.release.set()
+        self.wait()
+
+    def wait(self):
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+
+if __name__ == "__main__":
+    FiancoEngine().run()
@@ -1,78 +1,87 @@
 # game.py
+import re
 import pygame
+from functools import lru_cache
 from constants import *
 
+@lru_cache(maxsize=None)
+def cone_squares(board_size):
+    # For each player and square, the squares of the cone ahead of a piece there,
+    # nearest row first; a piece is super strong when its cone holds no opponent
+    cones = {'B': {}, 'W': {}}
+    for row in range(board_size):
+        for col in range(board_size):
+            for player, step in (('B', 1), ('W', -1)):
+                squares = []
+                r = row + step
+                while 0 <= r < board_size:
+                    distance = abs(r - row)
+                    squares.extend((r, c) for c in range(max(col - distance, 0), min(col + distance, board_size - 1) + 1))
+                    r += step
+                cones[player][(row, col)] = tuple(squares)
+    return cones
+
 class FiancoGame:
-    def __init__(self):
-        self.board = [['.' for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
-        
-        # Initialize the white pieces (reverse pyramid)
-        self.board[8] = ['W'] * BOARD_SIZE
-        self.board[7] = ['.', 'W', '.', '.', '.', '.', '.', 'W', '.']
-        self.board[6] = ['.', '.', 'W', '.', '.', '.', 'W', '.', '.']
-        self.board[5] = ['.', '.', '.', 'W', '.', 'W', '.', '.', '.']
-        
-        # Initialize the black pieces (pyramid)
-        self.board[0] = ['B'] * BOARD_SIZE
-        self.board[1] = ['.', 'B', '.', '.', '.', '.', '.', 'B', '.']
-        self.board[2] = ['.', '.', 'B', '.', '.', '.', 'B', '.', '.']
-        self.board[3] = ['.', '.', '.', 'B', '.', 'B', '.', '.', '.']
-        
-        self.current_player = 'B'
+    def __init__(self, current_player='B', board_size=BOARD_SIZE):
+        self.board_size = board_size
+        self.board = [['.' for _ in range(board_size)] for _ in range(board_size)]
+
+        # Black fills the top row and a pyramid below it, White mirrors it at the
+        # bottom; on 9x9 the pyramids reach rows 3 and 5, leaving the middle row empty
+        last = board_size - 1
+        self.board[0] = ['B'] * board_size
+        self.board[last] = ['W'] * board_size
+        for row in range(1, (board_size - 1) // 2):
+            self.board[row][row] = self.board[row][last - row] = 'B'
+            self.board[last - row][row] = self.board[last - row][last - row] = 'W'
+
+        self.zobrist_table, self.player_hash = zobrist_keys(board_size)
+        self.cones = cone_squares(board_size)
+        self.current_player = current_player
         self.move_history = []
         self.zobrist_hash = self.compute_zobrist_hash()
         self.capture_move_cache = {}
         self.move_cache = {}
-        self.undo_stack = []  # Stack for undoing moves
-        self.redo_stack = []  # Stack for redoing moves
+        self.hash_history = []  # Hashes of earlier positions, pushed by make_move
+        self.reversible_history = []  # Reversible-ply counters matching hash_history
+        self.reversible_plies = 0  # Consecutive sideways moves since the last irreversible move
     
     def compute_zobrist_hash(self):
         h = 0
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
+        for row in range(self.board_size):
+            for col in range(self.board_size):
                 piece = self.board[row][col]
-                if piece == 'B':
-                    piece_index = 0
-                elif piece == 'W':
-                    piece_index = 1
-                else:
+                if piece not in PIECE_INDEX:
                     continue  # Empty squares don't affect the hash
-                h ^= ZOBRIST_TABLE[row][col][piece_index]
+                h ^= self.zobrist_table[(row * self.board_size + col) * 2 + PIECE_INDEX[piece]]
         # Include current player in hash
         if self.current_player == 'B':
-            h ^= PLAYER_HASH
+            h ^= self.player_hash
         return h
 
     def update_zobrist_hash(self, start, end, piece, captured_piece=None, capture_end=None):
-        if piece == 'B':
-            piece_index = 0
-        elif piece == 'W':
-            piece_index = 1
-        else:
+        if piece not in PIECE_INDEX:
             return
+        piece_index = PIECE_INDEX[piece]
 
         s_row, s_col = start
         e_row, e_col = end
 
         # Remove piece from start position
-        self.zobrist_hash ^= ZOBRIST_TABLE[s_row][s_col][piece_index]
+        self.zobrist_hash ^= self.zobrist_table[(s_row * self.board_size + s_col) * 2 + piece_index]
         # Add piece to end position
-        self.zobrist_hash ^= ZOBRIST_TABLE[e_row][e_col][piece_index]
+        self.zobrist_hash ^= self.zobrist_table[(e_row * self.board_size + e_col) * 2 + piece_index]
 
         if captured_piece:
-            if captured_piece == 'B':
-                captured_index = 0
-            elif captured_piece == 'W':
-                captured_index = 1
-            else:
+            if captured_piece not in PIECE_INDEX:
                 return
             c_row, c_col = capture_end
             # Remove captured piece
-            self.zobrist_hash ^= ZOBRIST_TABLE[c_row][c_col][captured_index]
+            self.zobrist_hash ^= self.zobrist_table[(c_row * self.board_size + c_col) * 2 + PIECE_INDEX[captured_piece]]
 
     def draw_board(self):
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
+        for row in range(self.board_size):
+            for col in range(self.board_size):
                 rect = pygame.Rect(col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE)
                 if (row + col) % 2 == 0:
                     pygame.draw.rect(screen, DARK_GRAY, rect)
@@ -106,7 +115,9 @@ class FiancoGame:
             row_after = row_end + row_diff
             col_after = col_end + col_diff
 
-            if 0 <= row_after < BOARD_SIZE and 0 <= col_after < BOARD_SIZE:
+            if 0 <= row_after < self.board_size and 0 <= col_after < self.board_size:
+                # Captures are irreversible, so earlier positions can't repeat
+                self.push_history(reversible=False)
                 captured_piece = self.board[row_end][col_end]
                 self.board[row_after][col_after] = moving_piece
                 self.board[row_start][col_start] = '.'
@@ -116,11 +127,15 @@ class FiancoGame:
                 # Update move history
                 move_notation = f"{self.get_square_notation(start)}x{self.get_square_notation((row_after, col_after))}"
                 self.move_history.append(move_notation)
+                # Hand the turn to the opponent (toggles the side-to-move key)
+                self.switch_player()
                 # Return updated end position and captured piece info
                 return (start, (row_after, col_after)), (captured_piece, (row_end, col_end))
             else:
                 return None
         elif self.is_valid_move(start, end):
+            # Only sideways moves can be reversed; forward moves reset the window
+            self.push_history(reversible=row_start == row_end)
             self.board[row_end][col_end] = moving_piece
             self.board[row_start][col_start] = '.'
             # Update Zobrist hash
@@ -128,11 +143,15 @@ class FiancoGame:
             # Update move history
             move_notation = f"{self.get_square_notation(start)}-{self.get_square_notation(end)}"
             self.move_history.append(move_notation)
+            self.switch_player()
             return (start, end), None  # No capture
         else:
             return None  # Invalid move
 
     def undo_move(self, move_info, captured_piece_info):
+        if not self.hash_history:
+            # The hash is restored from the stack, so an unmatched undo would leave it stale
+            raise IndexError("undo_move without a matching make_move")
         (start, end) = move_info
         moving_piece = self.board[end[0]][end[1]]  # Get the piece from the end position
         s_row, s_col = start
@@ -145,24 +164,123 @@ class FiancoGame:
             c_row, c_col = capture_pos
             self.board[c_row][c_col] = captured_piece
 
-            # Update Zobrist hash for captured piece
-            captured_index = 0 if captured_piece == 'B' else 1
-            self.zobrist_hash ^= ZOBRIST_TABLE[c_row][c_col][captured_index]
-
-        # Update Zobrist hash
-        piece_index = 0 if moving_piece == 'B' else 1
-        # Remove piece from end position
-        self.zobrist_hash ^= ZOBRIST_TABLE[e_row][e_col][piece_index]
-        # Add piece back to start position
-        self.zobrist_hash ^= ZOBRIST_TABLE[s_row][s_col][piece_index]
+        # Give the turn back to the player who made the move
+        self.current_player = moving_piece
 
         # Remove move from history
         if self.move_history:
             self.move_history.pop()
+        # Restores the Zobrist hash saved by make_move, including the side to move
+        self.pop_history()
+
+    def push_history(self, reversible):
+        # Save the current position before a move is applied
+        self.hash_history.append(self.zobrist_hash)
+        self.reversible_history.append(self.reversible_plies)
+        self.reversible_plies = self.reversible_plies + 1 if reversible else 0
+
+    def pop_history(self):
+        self.zobrist_hash = self.hash_history.pop()
+        self.reversible_plies = self.reversible_history.pop()
+
+    def repetition_count(self):
+        # Count earlier occurrences of the current position with the same side to move.
+        # Only positions inside the reversible window can be identical.
+        count = 0
+        window = min(self.reversible_plies, len(self.hash_history))
+        for ply in range(2, window + 1, 2):
+            if self.hash_history[-ply] == self.zobrist_hash:
+                count += 1
+        return count
+
+    def is_repetition(self):
+        return self.repetition_count() > 0
 
     def get_square_notation(self, square):
         row, col = square
-        return f"{chr(97 + col)}{9 - row}"
+        return f"{chr(97 + col)}{self.board_size - row}"
+
+    def parse_square_notation(self, notation):
+        col = ord(notation[0]) - 97
+        row = self.board_size - int(notation[1:])
+        if not (0 <= row < self.board_size and 0 <= col < self.board_size):
+            raise ValueError(f"Invalid square: {notation}")
+        return row, col
+
+    def format_move(self, move):
+        # Same notation as move_history: 'e1-e2', or 'c3xe5' with the landing square for captures
+        start, end = move
+        if self.is_capture_move(start, end):
+            landing = (2 * end[0] - start[0], 2 * end[1] - start[1])
+            return f"{self.get_square_notation(start)}x{self.get_square_notation(landing)}"
+        return f"{self.get_square_notation(start)}-{self.get_square_notation(end)}"
+
+    def format_moves(self, moves):
+        # Format a sequence of moves, each in the position it is played from
+        notation = []
+        made = []
+        for move in moves:
+            notation.append(self.format_move(move))
+            made.append(self.make_move(*move))
+        for move_info, captured_piece_info in reversed(made):
+            self.undo_move(move_info, captured_piece_info)
+        return notation
+
+    def parse_move(self, text):
+        # Inverse of format_move; returns the (start, end) pair accepted by make_move
+        separator = 'x' if 'x' in text else '-'
+        start_text, end_text = text.split(separator)
+        start = self.parse_square_notation(start_text)
+        end = self.parse_square_notation(end_text)
+        if separator == 'x':
+            # make_move takes the captured square, halfway to the landing square
+            end = ((start[0] + end[0]) // 2, (start[1] + end[1]) // 2)
+        return start, end
+
+    def to_position_string(self):
+        # Rows from the top (row 0) separated by '/', 'b'/'w' for pieces, digits
+        # for runs of empty squares, then the side to move: e.g. '9/.../9 w'
+        rows = []
+        for row in self.board:
+            text = ''
+            empty = 0
+            for piece in row:
+                if piece == '.':
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                text += piece.lower()
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        return f"{'/'.join(rows)} {self.current_player.lower()}"
+
+    @classmethod
+    def from_position_string(cls, text):
+        parts = text.split()
+        if len(parts) != 2:
+            raise ValueError(f"Expected '<board> <side to move>': {text}")
+        board_text, player = parts
+        if player not in ('b', 'w'):
+            raise ValueError(f"Invalid side to move: {player}")
+        rows = board_text.split('/')
+        game = cls(current_player=player.upper(), board_size=len(rows))
+        for row, row_text in enumerate(rows):
+            squares = []
+            for token in re.findall(r'\d+|.', row_text):
+                if token.isdigit():
+                    squares.extend(['.'] * int(token))
+                elif token in ('b', 'w'):
+                    squares.append(token.upper())
+                else:
+                    raise ValueError(f"Invalid square in row {row}: {token}")
+            if len(squares) != game.board_size:
+                raise ValueError(f"Expected {game.board_size} squares in row {row}: {row_text}")
+            game.board[row] = squares
+        game.zobrist_hash = game.compute_zobrist_hash()
+        return game
 
     def is_valid_move(self, start, end):
         row_start, col_start = start
@@ -215,7 +333,7 @@ class FiancoGame:
         row_after = row_end + row_diff
         col_after = col_end + col_diff
 
-        if 0 <= row_after < BOARD_SIZE and 0 <= col_after < BOARD_SIZE:
+        if 0 <= row_after < self.board_size and 0 <= col_after < self.board_size:
             if self.board[row_after][col_after] == '.':
                 return True
 
@@ -226,8 +344,8 @@ class FiancoGame:
         if cache_key in self.capture_move_cache:
             return self.capture_move_cache[cache_key]
 
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
+        for row in range(self.board_size):
+            for col in range(self.board_size):
                 if self.board[row][col] == self.current_player:
                     if self.can_capture_from((row, col)):
                         self.capture_move_cache[cache_key] = True
@@ -246,9 +364,9 @@ class FiancoGame:
             col_end = col + d_col
             row_after = row_end + d_row
             col_after = col_end + d_col
-            if 0 <= row_end < BOARD_SIZE and 0 <= col_end < BOARD_SIZE:
+            if 0 <= row_end < self.board_size and 0 <= col_end < self.board_size:
                 if self.board[row_end][col_end] == opponent:
-                    if 0 <= row_after < BOARD_SIZE and 0 <= col_after < BOARD_SIZE:
+                    if 0 <= row_after < self.board_size and 0 <= col_after < self.board_size:
                         if self.board[row_after][col_after] == '.':
                             return True
         return False
@@ -261,31 +379,34 @@ class FiancoGame:
 
     def switch_player(self):
         # Update the zobrist hash for the current player
-        self.zobrist_hash ^= PLAYER_HASH
+        self.zobrist_hash ^= self.player_hash
         self.current_player = 'W' if self.current_player == 'B' else 'B'
-        self.capture_move_cache.clear()  # Clear cache when switching player
 
     def check_win(self):
         # Check if any player has reached the opposite side
-        for i in range(BOARD_SIZE):
+        for i in range(self.board_size):
             if self.board[0][i] == 'W':
                 return 'W'
-            if self.board[8][i] == 'B':
+            if self.board[self.board_size - 1][i] == 'B':
                 return 'B'
+        # Repeating the same position REPETITION_LIMIT times is a draw
+        if self.repetition_count() >= REPETITION_LIMIT - 1:
+            return 'D'
         # Check if any player has no valid moves
         if not self.get_all_moves():
             return 'W' if self.current_player == 'B' else 'B'
         return None
 
     def get_all_moves(self):
-        cache_key = (self.zobrist_hash, self.current_player)
+        # The hash includes the side to move, so it identifies the position on its own
+        cache_key = self.zobrist_hash
         if cache_key in self.move_cache:
             return self.move_cache[cache_key]
 
         moves = []
         has_capture = self.has_capture_move()
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
+        for row in range(self.board_size):
+            for col in range(self.board_size):
                 if self.board[row][col] == self.current_player:
                     if has_capture:
                         moves.extend(self.get_capture_moves(row, col))
@@ -297,39 +418,15 @@ class FiancoGame:
 
     def is_super_strong_piece(self, row, col):
         piece = self.board[row][col]
+        if piece not in self.cones:
+            return False  # Not a pawn
         opponent = 'W' if piece == 'B' else 'B'
-        is_clear = True
-
-        if piece == 'B':
-            # Black pawn moving down
-            for r in range(row + 1, BOARD_SIZE):
-                distance = r - row
-                col_start = col - distance
-                col_end = col + distance
-                for c in range(col_start, col_end + 1):
-                    if 0 <= c < BOARD_SIZE:
-                        if self.board[r][c] == opponent:
-                            is_clear = False
-                            break
-                if not is_clear:
-                    break
-        elif piece == 'W':
-            # White pawn moving up
-            for r in range(row - 1, -1, -1):
-                distance = row - r
-                col_start = col - distance
-                col_end = col + distance
-                for c in range(col_start, col_end + 1):
-                    if 0 <= c < BOARD_SIZE:
-                        if self.board[r][c] == opponent:
-                            is_clear = False
-                            break
-                if not is_clear:
-                    break
-        else:
-            is_clear = False  # Not a pawn
-
-        return is_clear
+        board = self.board
+        # Clear when no opponent stands in the precomputed cone ahead of the piece
+        for r, c in self.cones[piece][(row, col)]:
+            if board[r][c] == opponent:
+                return False
+        return True
 
     def get_capture_moves(self, row, col):
         moves = []
@@ -341,9 +438,9 @@ class FiancoGame:
             end_col = col + d_col
             final_row = end_row + d_row
             final_col = end_col + d_col
-            if 0 <= end_row < BOARD_SIZE and 0 <= end_col < BOARD_SIZE:
+            if 0 <= end_row < self.board_size and 0 <= end_col < self.board_size:
                 if self.board[end_row][end_col] == opponent:
-                    if 0 <= final_row < BOARD_SIZE and 0 <= final_col < BOARD_SIZE:
+                    if 0 <= final_row < self.board_size and 0 <= final_col < self.board_size:
                         if self.board[final_row][final_col] == '.':
                             # Return the initial and the immediate capture position
                             moves.append(((row, col), (end_row, end_col)))
@@ -359,7 +456,7 @@ class FiancoGame:
         for d_row, d_col in directions:
             end_row = row + d_row
             end_col = col + d_col
-            if 0 <= end_row < BOARD_SIZE and 0 <= end_col < BOARD_SIZE:
+            if 0 <= end_row < self.board_size and 0 <= end_col < self.board_size:
                 if self.board[end_row][end_col] == '.':
                     moves.append(((row, col), (end_row, end_col)))
         return moves
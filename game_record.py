@@ -0,0 +1,125 @@
+# game_record.py
+import os
+import struct
+from constants import BOARD_SIZE
+from game import FiancoGame
+
+# File layout: a header, then self-contained game records appended one after another.
+# Each game is a fixed header followed by one byte per move. The byte is the move's
+# index in FiancoGame.get_all_moves(), so readers decode moves by replaying the game.
+RECORD_MAGIC = b'FNGR'
+# Moves are stored as indices into get_all_moves(), so changing the order in which
+# FiancoGame generates moves changes the format: bump this version when doing so
+RECORD_FORMAT_VERSION = 1
+FILE_HEADER = struct.Struct('<4sHH')  # magic, format version, board size
+GAME_HEADER = struct.Struct('<ccBBfH')  # first player, result, black depth, white depth, time limit, plies
+NO_RESULT = '?'
+
+
+def encode_moves(moves, first_player='W', board_size=BOARD_SIZE):
+    # Replay the moves and replace each one with its index among the legal moves
+    game = FiancoGame(current_player=first_player, board_size=board_size)
+    encoded = bytearray()
+    for move in moves:
+        legal_moves = game.get_all_moves()
+        if move not in legal_moves:
+            raise ValueError(f"Illegal move {move} at ply {len(encoded)}")
+        encoded.append(legal_moves.index(move))
+        game.make_move(*move)
+    return bytes(encoded)
+
+
+def replay(header, encoded_moves):
+    """Replay an encoded game, yielding (game, move) before each move is made.
+
+    The same FiancoGame instance is yielded every time and is advanced once
+    the consumer asks for the next move.
+    """
+    game = FiancoGame(current_player=header['first_player'], board_size=header['board_size'])
+    for index in encoded_moves:
+        move = game.get_all_moves()[index]
+        yield game, move
+        game.make_move(*move)
+
+
+class GameRecordWriter:
+    """Appends finished games to a record file, creating it on first use.
+
+    A record file holds games of a single board size. The file is checked
+    once, on the first write; after that games are written at the tracked end
+    offset, so each append costs the same however large the file grows. Only
+    one writer should append to a file at a time.
+    """
+
+    def __init__(self, path, board_size=BOARD_SIZE):
+        self.path = path
+        self.board_size = board_size
+        self.end = None  # Offset after the last complete game, found on first write
+
+    def write_game(self, moves, result=None, first_player='W', black_depth=0, white_depth=0, time_limit=0.0):
+        encoded = encode_moves(moves, first_player, self.board_size)
+        header = GAME_HEADER.pack(first_player.encode(), (result or NO_RESULT).encode(),
+                                  black_depth, white_depth, time_limit, len(encoded))
+        if self.end is None:
+            self.end = self.prepare_file()
+        with open(self.path, 'r+b') as f:
+            # Writing at the tracked end also overwrites anything an interrupted write left behind
+            f.seek(self.end)
+            f.write(header + encoded)
+            f.truncate()
+        self.end += len(header) + len(encoded)
+
+    def prepare_file(self):
+        # Start a fresh file if it is missing or cut off inside the file header, and
+        # cut off a partial game left by an interrupted write so appends stay aligned.
+        # Returns the offset where the next game goes.
+        file_header = FILE_HEADER.pack(RECORD_MAGIC, RECORD_FORMAT_VERSION, self.board_size)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < FILE_HEADER.size:
+            with open(self.path, 'wb') as f:
+                f.write(file_header)
+            return FILE_HEADER.size
+        with open(self.path, 'rb') as f:
+            if f.read(FILE_HEADER.size) != file_header:
+                raise ValueError(f"{self.path} is not a {self.board_size}x{self.board_size} "
+                                 f"version {RECORD_FORMAT_VERSION} game record file")
+        valid_length = FILE_HEADER.size
+        for _, encoded_moves in read_records(self.path):
+            valid_length += GAME_HEADER.size + len(encoded_moves)
+        if valid_length < size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_length)
+        return valid_length
+
+
+def read_records(path):
+    # Yield (header, encoded moves) for each game, reading one game at a time
+    with open(path, 'rb') as f:
+        magic, version, board_size = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != RECORD_MAGIC or version != RECORD_FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {RECORD_FORMAT_VERSION} game record file")
+        while True:
+            data = f.read(GAME_HEADER.size)
+            if len(data) < GAME_HEADER.size:
+                return  # End of file, or a game cut off mid-write
+            first_player, result, black_depth, white_depth, time_limit, plies = GAME_HEADER.unpack(data)
+            encoded_moves = f.read(plies)
+            if len(encoded_moves) < plies:
+                return
+            result = result.decode()
+            header = {
+                'board_size': board_size,
+                'first_player': first_player.decode(),
+                'result': None if result == NO_RESULT else result,
+                'black_depth': black_depth,
+                'white_depth': white_depth,
+                'time_limit': time_limit,
+                'plies': plies,
+            }
+            yield header, encoded_moves
+
+
+def read_games(path):
+    # Yield (header, moves) with moves decoded to the (start, end) pairs accepted by make_move
+    for header, encoded_moves in read_records(path):
+        yield header, [move for _, move in replay(header, encoded_moves)]
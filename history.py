@@ -0,0 +1,137 @@
+# history.py
+from game import FiancoGame
+
+# Plies between full board snapshots; jumps never replay more moves than this
+SNAPSHOT_INTERVAL = 16
+
+
+def stack_tail(base, per_ply, ply, length):
+    # Last `length` entries of base + per_ply[:ply], without building the whole list
+    if length <= ply:
+        return per_ply[ply - length:ply]
+    return base[max(len(base) - (length - ply), 0):] + per_ply[:ply]
+
+
+class GameHistory:
+    """Move list of a game with periodic snapshots for fast navigation.
+
+    Every ply keeps its move, the make_move result needed to undo it and the
+    bookkeeping the game tracks for repetition detection. Every
+    SNAPSHOT_INTERVAL plies a copy of the board is kept, so jumping to any ply
+    restores the nearest snapshot and replays at most SNAPSHOT_INTERVAL - 1
+    moves. The game's hash and history stacks stay consistent across every
+    operation, but after a snapshot is restored the stacks and move_history
+    only hold the recent plies that repetition checks and undo need, so a jump
+    costs the same at any game length.
+    """
+
+    def __init__(self, game, moves=(), deltas=(), hashes=(), reversible=(), notations=(),
+                 base_history=None, snapshots=None):
+        # Without snapshots this starts tracking the game where it stands.
+        # Otherwise the per-ply lists, base_history and snapshots describe an
+        # existing line, and the game is set up at its last ply.
+        self.game = game
+        self.ply = 0
+        self.floor = 0  # Lowest ply the game's history stacks can be undone to
+        self.moves = list(moves)  # (start, end) as passed to make_move
+        self.deltas = list(deltas)  # make_move results, used to undo each ply
+        self.hashes = list(hashes)  # Zobrist hash before each ply
+        self.reversible = list(reversible)  # Reversible-ply counter before each ply
+        self.notations = list(notations)  # move_history entry of each ply
+        # Whatever history the game already had when tracking started
+        if base_history is None:
+            base_history = (list(game.hash_history), list(game.reversible_history), list(game.move_history))
+        self.base_hash_history, self.base_reversible_history, self.base_move_history = base_history
+        if snapshots is None:
+            self.snapshots = [self.take_snapshot()]  # snapshots[k] is the position at ply k * SNAPSHOT_INTERVAL
+        else:
+            self.snapshots = snapshots
+            last = len(self.moves)
+            self.restore_snapshot(last - last % SNAPSHOT_INTERVAL)
+            self.jump(last)
+
+    def __len__(self):
+        return len(self.moves)
+
+    def move_count(self):
+        # Full length of the game's move_history, which may only hold a recent tail
+        return len(self.base_move_history) + self.ply
+
+    def take_snapshot(self):
+        game = self.game
+        return tuple(tuple(row) for row in game.board), game.current_player, game.zobrist_hash, game.reversible_plies
+
+    def restore_snapshot(self, ply):
+        board, current_player, zobrist_hash, reversible_plies = self.snapshots[ply // SNAPSHOT_INTERVAL]
+        game = self.game
+        game.board = [list(row) for row in board]
+        game.current_player = current_player
+        game.zobrist_hash = zobrist_hash
+        game.reversible_plies = reversible_plies
+        # Repetition checks look back reversible_plies entries; keep a few more so
+        # short undos and the move list display don't need another restore
+        length = max(reversible_plies, SNAPSHOT_INTERVAL)
+        game.hash_history = stack_tail(self.base_hash_history, self.hashes, ply, length)
+        game.reversible_history = stack_tail(self.base_reversible_history, self.reversible, ply, length)
+        game.move_history = stack_tail(self.base_move_history, self.notations, ply, length)
+        self.ply = ply
+        self.floor = ply
+
+    def play(self, move):
+        # Make a move at the current ply, dropping any moves that followed it
+        game = self.game
+        zobrist_hash, reversible_plies = game.zobrist_hash, game.reversible_plies
+        delta = game.make_move(*move)
+        if delta is None:
+            return None  # Invalid move; the moves that followed are kept
+        if self.ply < len(self.moves):
+            del self.moves[self.ply:], self.deltas[self.ply:], self.hashes[self.ply:]
+            del self.reversible[self.ply:], self.notations[self.ply:]
+            del self.snapshots[self.ply // SNAPSHOT_INTERVAL + 1:]
+        self.moves.append(move)
+        self.deltas.append(delta)
+        self.hashes.append(zobrist_hash)
+        self.reversible.append(reversible_plies)
+        self.notations.append(game.move_history[-1])
+        self.ply += 1
+        if self.ply % SNAPSHOT_INTERVAL == 0:
+            self.snapshots.append(self.take_snapshot())
+        return delta
+
+    def jump(self, ply):
+        # Move to any ply between 0 and len(self), stepping or restoring a snapshot
+        if not 0 <= ply <= len(self.moves):
+            raise IndexError(f"Ply {ply} is outside 0..{len(self.moves)}")
+        if self.floor <= ply < self.ply and self.ply - ply < SNAPSHOT_INTERVAL:
+            while self.ply > ply:
+                self.ply -= 1
+                self.game.undo_move(*self.deltas[self.ply])
+            return
+        if not ply - SNAPSHOT_INTERVAL < self.ply <= ply:
+            self.restore_snapshot(ply - ply % SNAPSHOT_INTERVAL)
+        while self.ply < ply:
+            self.game.make_move(*self.moves[self.ply])
+            self.ply += 1
+
+    def undo(self, plies=1):
+        if self.ply < plies:
+            return False
+        self.jump(self.ply - plies)
+        return True
+
+    def redo(self, plies=1):
+        if self.ply + plies > len(self.moves):
+            return False
+        self.jump(self.ply + plies)
+        return True
+
+    def branch(self):
+        # Independent history at the current ply, for exploring a variation
+        # without touching this line; snapshots are immutable and shared
+        game = FiancoGame(current_player=self.game.current_player, board_size=self.game.board_size)
+        game.move_cache = self.game.move_cache  # Both caches are keyed by Zobrist hash
+        game.capture_move_cache = self.game.capture_move_cache
+        base_history = (self.base_hash_history, self.base_reversible_history, self.base_move_history)
+        return GameHistory(game, self.moves[:self.ply], self.deltas[:self.ply], self.hashes[:self.ply],
+                           self.reversible[:self.ply], self.notations[:self.ply], base_history,
+                           self.snapshots[:self.ply // SNAPSHOT_INTERVAL + 1])
@@ -1,23 +1,52 @@
 # main.py
+import argparse
+import os
 import pygame
 import sys
 import time
-import cProfile
-import pstats
-import io
 
 from constants import *
 from game import FiancoGame
 from ai import get_ai_move
+from analysis_cache import AnalysisCache
+from game_record import GameRecordWriter
+from history import GameHistory
+from profiling import MoveProfiler
 from ui import color_selection_menu, draw_sidebar
 
+def save_game_record(record_writer, history, winner, ai_player, depth, time_limit):
+    # Append the finished game to the record file, if one is configured
+    if record_writer is None:
+        return
+    moves = history.moves[:history.ply]
+    black_depth = depth if ai_player == 'B' else 0  # Depth 0 marks the human side
+    white_depth = depth if ai_player == 'W' else 0
+    record_writer.write_game(moves, winner, 'W', black_depth, white_depth, time_limit)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fianco Game with AI")
+    parser.add_argument('--profile', nargs='?', const='profiles', default=os.environ.get('FIANCO_PROFILE'),
+                        metavar='DIR', help="profile every AI move and save the stats to DIR (default: profiles)")
+    parser.add_argument('--flamegraph', action='store_true',
+                        help="with --profile, also write collapsed stacks for flame graph tools")
+    return parser.parse_args()
+
 # Main game loop
 def main():
+    args = parse_args()
+    profiler = MoveProfiler(args.profile, collapsed=args.flamegraph) if args.profile else None
+
     # Let the player choose their color at the start
     human_player, ai_player = color_selection_menu()
 
-    game = FiancoGame()
-    game.current_player = 'W'  # White always starts
+    game = FiancoGame(current_player='W')  # White always starts
+    history = GameHistory(game)  # Undo/redo navigate this move list
+    analysis_cache = AnalysisCache(ANALYSIS_CACHE_PATH, game.board_size) if ANALYSIS_CACHE_PATH else None
+    if analysis_cache is not None:
+        analysis_cache.ensure_loaded()  # Report a mismatched cache file now, not at the first AI move
+    record_writer = GameRecordWriter(GAME_RECORD_PATH, game.board_size) if GAME_RECORD_PATH else None
+    depth = 15  # Set AI depth
+    time_limit = 8
 
     selected_piece = None
     possible_moves = []  # To store the valid moves for the selected piece
@@ -33,13 +62,16 @@ def main():
             pygame.draw.rect(screen, BLUE, (col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE), 3)
 
         # Get the button rects
-        undo_button_rect, redo_button_rect = draw_sidebar(screen, game.move_history, game.current_player)
+        undo_button_rect, redo_button_rect = draw_sidebar(screen, game.move_history, game.current_player,
+                                                                history.move_count())
         pygame.display.flip()
         
         winner = game.check_win()
         if winner:
+            save_game_record(record_writer, history, winner, ai_player, depth, time_limit)
             font = pygame.font.Font(None, 72)
-            text = font.render(f"{winner} wins!", True, GREEN)
+            message = "Draw!" if winner == 'D' else f"{winner} wins!"
+            text = font.render(message, True, GREEN)
             text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
             screen.blit(text, text_rect)
             pygame.display.flip()
@@ -57,36 +89,12 @@ def main():
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     pos = pygame.mouse.get_pos()
                     if undo_button_rect.collidepoint(pos):
-                        # Handle Undo
-                        if len(game.undo_stack) >= 2:
-                            # Undo AI's move
-                            start, end, move_info, captured_piece_info, player = game.undo_stack.pop()
-                            game.switch_player()  # Switch to AI
-                            game.undo_move(move_info, captured_piece_info)
-                            game.redo_stack.append((start, end, move_info, captured_piece_info, player))
-                            
-                            # Undo user's move
-                            start, end, move_info, captured_piece_info, player = game.undo_stack.pop()
-                            game.switch_player()  # Switch to human
-                            game.undo_move(move_info, captured_piece_info)
-                            game.redo_stack.append((start, end, move_info, captured_piece_info, player))
-                        else:
+                        # Handle Undo: take back the AI's move and the user's move
+                        if not history.undo(2):
                             print("No moves to undo")
                     elif redo_button_rect.collidepoint(pos):
-                        # Handle Redo
-                        if len(game.redo_stack) >= 2:
-                            # Redo user's move
-                            start, end, move_info, captured_piece_info, player = game.redo_stack.pop()
-                            move_made = game.make_move(start, end)
-                            game.undo_stack.append((start, end, move_made[0], move_made[1], player))
-                            game.switch_player()  # Switch to AI
-                            
-                            # Redo AI's move
-                            start, end, move_info, captured_piece_info, player = game.redo_stack.pop()
-                            move_made = game.make_move(start, end)
-                            game.undo_stack.append((start, end, move_made[0], move_made[1], player))
-                            game.switch_player()  # Switch back to human
-                        else:
+                        # Handle Redo: replay the user's move and the AI's reply
+                        if not history.redo(2):
                             print("No moves to redo")
                     else:
                         # Click on board
@@ -102,14 +110,11 @@ def main():
                                 # Try to make a move
                                 move = (selected_piece, (row, col))
                                 if move in possible_moves:
-                                    move_info, captured_piece_info = game.make_move(*move)
-                                    if move_info:
-                                        # Record the move onto the undo_stack
-                                        game.undo_stack.append((selected_piece, (row, col), move_info, captured_piece_info, game.current_player))
-                                        game.redo_stack.clear()
+                                    # Playing through the history drops any redo moves;
+                                    # make_move hands the turn to the AI
+                                    if history.play(move):
                                         selected_piece = None
                                         possible_moves = []  # Clear possible moves after making the move
-                                        game.switch_player()  # Switch to AI turn
                                 else:
                                     # Invalid move or clicked outside possible moves, deselect piece
                                     selected_piece = None
@@ -121,23 +126,23 @@ def main():
 
         # Handle AI turn
         elif game.current_player == ai_player:
-            depth = 15  # Set AI depth
             try:
-                move = get_ai_move(game, depth, time_limit=8)
+                if profiler:
+                    move = profiler.profile(get_ai_move, game, depth, time_limit=time_limit, analysis_cache=analysis_cache)
+                else:
+                    move = get_ai_move(game, depth, time_limit=time_limit, analysis_cache=analysis_cache)
             except TimeoutError:
                 move = None  # If time runs out, make no move
             
             if move:
                 start, end = move
-                move_info, captured_piece_info = game.make_move(start, end)
-                print(f"AI {game.current_player} moved from {start} to {end}")
-                # Record the AI's move onto the undo_stack
-                game.undo_stack.append((start, end, move_info, captured_piece_info, game.current_player))
-                game.redo_stack.clear()
-                game.switch_player()  # Switch back to human turn
+                # make_move hands the turn back to the human
+                history.play(move)
+                print(f"AI {ai_player} moved from {start} to {end}")
             else:
                 print(f"AI {game.current_player} has no valid moves")
                 winner = human_player if game.current_player == ai_player else ai_player
+                save_game_record(record_writer, history, winner, ai_player, depth, time_limit)
                 font = pygame.font.Font(None, 72)
                 text = font.render(f"{winner} wins!", True, GREEN)
                 text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
@@ -0,0 +1,77 @@
+# profiling.py
+import cProfile
+import os
+import pstats
+
+import ai
+
+
+def collapsed_stacks(stats, min_seconds=1e-5):
+    # Approximate collapsed stacks ('a;b;c microseconds' lines) for flame graph tools.
+    # cProfile only records caller -> callee edges, so each edge's cumulative time
+    # is split along the paths leading to the caller in proportion to their share.
+    stats.calc_callees()
+    callees = stats.all_callees
+    called = {callee for children in callees.values() for callee in children}
+    roots = [func for func in stats.stats if func not in called]
+    lines = []
+
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def walk(func, stack, seconds):
+        _, _, tottime, cumtime, _ = stats.stats[func]
+        share = seconds / cumtime if cumtime else 0
+        if tottime * share >= min_seconds:
+            lines.append(f"{';'.join(stack)} {int(tottime * share * 1e6)}")
+        for callee, edge in callees.get(func, {}).items():
+            edge_seconds = edge[3] * share
+            if label(callee) in stack or edge_seconds < min_seconds:
+                continue  # Recursive calls are already folded into the outer frame
+            walk(callee, stack + [label(callee)], edge_seconds)
+
+    for root in roots:
+        walk(root, [label(root)], stats.stats[root][3])
+    return '\n'.join(lines) + '\n'
+
+
+class MoveProfiler:
+    """Profiles AI move searches one call at a time.
+
+    Each call saves its pstats dump (and optionally collapsed stacks) to
+    output_dir and prints the hottest functions with their cumulative time
+    per searched node.
+    """
+
+    def __init__(self, output_dir, collapsed=False, top=15):
+        self.output_dir = output_dir
+        self.collapsed = collapsed
+        self.top = top
+        self.calls = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def profile(self, func, *args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            self.calls += 1
+            self.report(profiler)
+
+    def report(self, profiler):
+        name = os.path.join(self.output_dir, f"move_{self.calls:03d}")
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(name + '.prof')
+        if self.collapsed:
+            with open(name + '.collapsed', 'w') as f:
+                f.write(collapsed_stacks(stats))
+
+        nodes = max(ai.search_nodes, 1)
+        print(f"Profile of move {self.calls}: {nodes} nodes, saved to {name}.prof")
+        print(f"{'cumtime':>10} {'us/node':>10} {'calls':>10}  function")
+        by_cumtime = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        for (filename, line, function), (_, calls, _, cumtime, _) in by_cumtime[:self.top]:
+            print(f"{cumtime:10.3f} {cumtime / nodes * 1e6:10.2f} {calls:10d}  "
+                  f"{function} ({os.path.basename(filename)}:{line})")
+
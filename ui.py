@@ -39,7 +39,10 @@ def color_selection_menu():
                 elif black_button_rect.collidepoint(pos):
                     return 'B', 'W'  # Human plays Black, AI plays White
 
-def draw_sidebar(screen, move_history, current_player):
+def draw_sidebar(screen, move_history, current_player, move_count=None):
+    # move_count numbers the moves when move_history only holds the latest ones
+    if move_count is None:
+        move_count = len(move_history)
     sidebar_rect = pygame.Rect(BOARD_WIDTH, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT)
     pygame.draw.rect(screen, WHITE, sidebar_rect)
     
@@ -51,7 +54,7 @@ def draw_sidebar(screen, move_history, current_player):
     start_y = 40  # Starting y-coordinate for move list
     moves_to_display = move_history[-10:]  # Get the last 10 moves
     for i, move in enumerate(moves_to_display):
-        move_text = font.render(f"{len(move_history) - len(moves_to_display) + i + 1}. {move}", True, BLACK)
+        move_text = font.render(f"{move_count - len(moves_to_display) + i + 1}. {move}", True, BLACK)
         screen.blit(move_text, (BOARD_WIDTH + 10, start_y + i * 25))
 
     # Display current player